@@ -7,126 +7,212 @@ from dotenv import load_dotenv
 import os
 
 # --- DB Setup ---
-if os.environ.get("LOCAL", "0") == "1":
-    load_dotenv()
-    url = os.environ.get("SUPABASE_URL")
-    key = os.environ.get("SUPABASE_KEY")
-else:
-    url = st.secrets["SUPABASE_URL"]
-    key = st.secrets["SUPABASE_KEY"]
-supabase: Client = create_client(url, key)
+# Built once per server process: the secrets lookup and TLS handshake only
+# happen on the first call, and the client's HTTP session is reused after that
+@st.cache_resource
+def get_supabase() -> Client:
+    if os.environ.get("LOCAL", "0") == "1":
+        load_dotenv()
+        url = os.environ.get("SUPABASE_URL")
+        key = os.environ.get("SUPABASE_KEY")
+    else:
+        url = st.secrets["SUPABASE_URL"]
+        key = st.secrets["SUPABASE_KEY"]
+    return create_client(url, key)
+
+supabase: Client = get_supabase()
+
+PAGE_SIZE = 25
+
+# Computed once per rerun; also passed into date-dependent cached functions
+# so their caches key on it and roll over at day boundaries
+TODAY = datetime.today().date()
 
 # --- Functions ---
 def add_question(question, answer):
-    today = datetime.today().date()
+    # returning="minimal": the app never reads the inserted row back
     supabase.table("questions").insert({
         "question": question,
         "answer": answer,
         "last_reviewed": None,
-        "next_review": today.isoformat(),
+        "next_review": TODAY.isoformat(),
         "interval_days": 3
-    }).execute()
-
-def get_all_questions():
-    response = supabase.table("questions").select("*").execute()
+    }, returning="minimal").execute()
+    # New question shows up in today's review list
+    get_all_questions.clear()
+    get_question_count.clear()
+    get_grouped_questions.clear()
+    get_dashboard_metrics.clear()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_all_questions(page=1):
+    # Only one page of rows leaves the database, regardless of deck size
+    offset = (page - 1) * PAGE_SIZE
+    response = supabase.table("questions") \
+        .select("id,question,next_review") \
+        .order("next_review") \
+        .range(offset, offset + PAGE_SIZE - 1) \
+        .execute()
     return response.data if response.data else []
 
-def get_grouped_questions():
-    today = datetime.today().date()
-    tomorrow = today + timedelta(days=1)
+@st.cache_data(ttl=60, show_spinner=False)
+def get_question_count():
+    response = supabase.table("questions").select("id", count="exact", head=True).execute()
+    return response.count if response.count else 0
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_question_detail(question_id):
+    # The answer column is only fetched when a question is actually opened
+    response = supabase.table("questions") \
+        .select("id,question,answer") \
+        .eq("id", question_id) \
+        .single() \
+        .execute()
+    return response.data
 
-    # Due today
-    due_today = supabase.table("questions") \
-        .select("*") \
-        .lte("next_review", today.isoformat()) \
-        .execute().data
+@st.cache_data(ttl=60, show_spinner=False)
+def get_grouped_questions(today):
+    tomorrow = (today + timedelta(days=1)).isoformat()
+    today = today.isoformat()
 
-    # Due tomorrow
-    due_tomorrow = supabase.table("questions") \
-        .select("*") \
-        .eq("next_review", tomorrow.isoformat()) \
-        .execute().data
+    # One fetch, bucketed locally: the three date predicates were three
+    # round trips against the same table
+    rows = supabase.table("questions") \
+        .select("id,question,next_review,interval_days") \
+        .order("next_review") \
+        .execute().data or []
+    rows = [r for r in rows if r["next_review"]]
 
-    # Future
-    future = supabase.table("questions") \
-        .select("*") \
-        .gt("next_review", tomorrow.isoformat()) \
-        .execute().data
+    due_today = [r for r in rows if r["next_review"] <= today]
+    due_tomorrow = [r for r in rows if r["next_review"] == tomorrow]
+    future = [r for r in rows if r["next_review"] > tomorrow]
 
     return due_today, due_tomorrow, future
 
-def get_review_history(question_id):
+@st.cache_data(ttl=60, show_spinner=False)
+def get_review_histories(question_ids):
+    # One query for every due question instead of one query per question
+    if not question_ids:
+        return {}
     response = supabase.table("reviews") \
-        .select("review_date") \
-        .eq("question_id", question_id) \
+        .select("question_id,review_date") \
+        .in_("question_id", list(question_ids)) \
         .order("review_date") \
         .execute()
-    return [row["review_date"] for row in response.data] if response.data else []
+    histories = {}
+    for row in (response.data or []):
+        histories.setdefault(row["question_id"], []).append(row["review_date"])
+    return histories
 
 def update_review(question_id, reviewed=True):
-    today = datetime.today().date()
-
-    # Get current interval
-    question = supabase.table("questions").select("interval_days").eq("id", question_id).execute()
-    if not question.data:
-        return
-
-    interval = question.data[0]["interval_days"]
-    new_interval = min(interval * 2, 60) if reviewed else 3
-    next_review = today + timedelta(days=new_interval)
-
-    # Update question
-    supabase.table("questions").update({
-        "last_reviewed": today.isoformat(),
-        "next_review": next_review.isoformat(),
-        "interval_days": new_interval
-    }).eq("id", question_id).execute()
-
-    # Insert into reviews
-    supabase.table("reviews").insert({
-        "question_id": question_id,
-        "review_date": today.isoformat()
+    # One atomic RPC doubles the interval (capped at 60 days) and logs the
+    # review, replacing the old select + update + insert round trips
+    supabase.rpc("mark_reviewed", {
+        "qid": question_id,
+        "remembered": reviewed
     }).execute()
 
-def get_reviews_per_day():
-    response = supabase.table("reviews") \
-        .select("review_date") \
-        .execute()
+    # The review moved this question's schedule and added a history row
+    get_all_questions.clear()
+    get_grouped_questions.clear()
+    get_review_histories.clear()
+    get_reviews_per_day.clear()
+    get_questions_reviewed_on.clear()
+    get_dashboard_metrics.clear()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_reviews_per_day(start_date, end_date):
+    # Counts are grouped in Postgres and only the rendered window is fetched
+    response = supabase.rpc("reviews_per_day", {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat()
+    }).execute()
 
     if not response.data:
         return pd.DataFrame(columns=['date', 'count'])
 
-    df = pd.DataFrame(response.data)
-
-    # Ensure proper datetime conversion
-    df['review_date'] = pd.to_datetime(df['review_date'])
-
-    # Count reviews per day
-    daily_counts = df.groupby(df['review_date'].dt.date).size().reset_index(name='count')
-
-    # Convert to datetime for merging
-    daily_counts['review_date'] = pd.to_datetime(daily_counts['review_date'])
+    daily_counts = pd.DataFrame(response.data)
+    # Explicit format hits the C parser; cache memoizes repeated dates
+    daily_counts['date'] = pd.to_datetime(daily_counts['review_date'], format="%Y-%m-%d", cache=True)
 
     # Fill missing days
-    date_range = pd.date_range(daily_counts['review_date'].min(), datetime.today())
+    date_range = pd.date_range(start_date, end_date)
     df_full = pd.DataFrame(date_range, columns=['date']).merge(
-        daily_counts.rename(columns={'review_date': 'date'}),
+        daily_counts[['date', 'count']],
         on='date',
         how='left'
     ).fillna(0)
 
     return df_full
 
+@st.cache_data(ttl=30, show_spinner=False)
+def get_dashboard_metrics(today):
+    # One RPC instead of four separate count queries (see supabase_setup.sql);
+    # `today` only keys the cache, the counts use current_date server-side
+    return supabase.rpc("dashboard_metrics").execute().data
+
+@st.cache_data(ttl=60, show_spinner=False)
 def get_questions_reviewed_on(date):
-    response = supabase.table("reviews") \
-        .select("question_id, review_date, questions!inner(question)") \
+    # The view joins and dedupes server-side, so only question text comes back
+    response = supabase.table("reviews_with_question") \
+        .select("question") \
         .eq("review_date", date.isoformat()) \
         .execute()
 
     if not response.data:
         return []
 
-    return [row["questions"]["question"] for row in response.data]
+    return [row["question"] for row in response.data]
+
+@st.cache_data(show_spinner=False)
+def build_heatmap(counts_tuple, start_date):
+    # Figure construction (and its Plotly JSON payload) is cached until the
+    # counts for the rendered window actually change
+    all_dates = pd.date_range(start=start_date, periods=len(counts_tuple))
+
+    weeks = ((all_dates - start_date).days // 7).to_numpy()
+    # Map weekday to Sun=0 ... Sat=6
+    weekdays = ((all_dates.weekday + 1) % 7).to_numpy()
+
+    fig = go.Figure(data=go.Heatmap(
+        x=weeks,
+        y=weekdays,
+        z=list(counts_tuple),
+        text=[f"{d.date()}: {c} reviews" for d, c in zip(all_dates, counts_tuple)],
+        hoverinfo="text",
+        colorscale=[
+            [0, "#ebedf0"],
+            [0.2, "#c6e48b"],
+            [0.4, "#7bc96f"],
+            [0.6, "#239a3b"],
+            [1.0, "#196127"]
+        ],
+        zmin=0,
+        zmax=max(counts_tuple) if counts_tuple else 1,
+        showscale=False,
+        hoverongaps=False
+    ))
+
+    fig.update_layout(
+        title="📅 Review Activity",
+        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False, fixedrange=True),
+        yaxis=dict(
+            showgrid=False,
+            zeroline=False,
+            tickmode="array",
+            tickvals=[0, 1, 2, 3, 4, 5, 6],
+            ticktext=["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"],
+            fixedrange=True,
+            autorange='reversed'  # Flip vertical order
+        ),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        dragmode=False,
+        height=180,
+        margin=dict(l=20, r=20, t=30, b=20)
+    )
+
+    return fig
 
 #############################
 # --- Streamlit App ---
@@ -137,18 +223,17 @@ st.caption(f"\nServer time: {server_time}")
 tab1, tab2, tab3, tab4 = st.tabs(["🔁 Review", "📊 Dashboard", "📖 All Questions", "➕ Add Question"])
 
 # --- Tab 1: Review ---
-with tab1:
-    due_today, _, _ = get_grouped_questions()
-
-    st.subheader(f"To Review Today: {len(due_today)} question{'s' if len(due_today) != 1 else ''}")
-
+# Scoped as a fragment so revealing/closing an answer only reruns this
+# panel instead of the whole script (and its queries in the other tabs)
+@st.fragment
+def review_panel(due_today, histories):
     # If reviewing a question
     if "reviewing" in st.session_state:
         row = st.session_state["reviewing"]
 
         st.markdown("---")
         st.markdown(
-            f"<span style='font-size: 16px;'><b>Question:</b> {row['question']}</span>", 
+            f"<span style='font-size: 16px;'><b>Question:</b> {row['question']}</span>",
             unsafe_allow_html=True
         )
         user_answer = st.text_area("Your Answer", placeholder="(you can write code here)")
@@ -162,30 +247,32 @@ with tab1:
             if not st.session_state["show_answer"]:
                 if st.button("Reveal Answer", key="reveal"):
                     st.session_state["show_answer"] = True
-                    st.rerun()
+                    st.rerun(scope="fragment")
             else:
                 if st.button("Close Answer", key="close"):
                     st.session_state["show_answer"] = False
-                    st.rerun()
+                    st.rerun(scope="fragment")
 
         if st.session_state["show_answer"]:
-            st.text_area("Correct Answer", row['answer'], height=150, disabled=True)
+            detail = get_question_detail(row['id'])
+            st.text_area("Correct Answer", detail['answer'], height=150, disabled=True)
 
         if st.button("✅ Mark as reviewed", key="mark_reviewed"):
             update_review(row['id'], True)
             del st.session_state["reviewing"]
             st.session_state["show_answer"] = False
             st.success("Marked as reviewed!")
+            # Full rerun: the due list and dashboard counts changed
             st.rerun()
-        
+
         # Add "See other questions" as a back button
         if st.button("<- See other questions", key="back_to_list"):
             del st.session_state["reviewing"]
             st.session_state["show_answer"] = False
-            st.rerun()
+            st.rerun(scope="fragment")
 
         # Show review history
-        review_dates = get_review_history(row['id'])
+        review_dates = histories.get(row['id'], [])
         st.markdown("---")
         st.markdown(f"**Reviewed:** {len(review_dates)} time{'s' if len(review_dates) != 1 else ''}")
         if review_dates:
@@ -206,95 +293,41 @@ with tab1:
 
             if st.button(question_label, key=f"today_{row['id']}"):
                 st.session_state["reviewing"] = row
-                st.rerun()
-
-# --- Tab 2: Dashboard ---
-with tab2:
-    today = datetime.today().date()
+                st.rerun(scope="fragment")
 
-    # Total questions
-    total_resp = supabase.table("questions").select("id", count="exact").execute()
-    total = total_resp.count if total_resp.count else 0
+with tab1:
+    due_today, _, _ = get_grouped_questions(TODAY)
 
-    # Due today
-    due_today_resp = supabase.table("questions").select("id", count="exact") \
-        .eq("next_review", today.isoformat()).execute()
-    due_today = due_today_resp.count if due_today_resp.count else 0
+    st.subheader(f"To Review Today: {len(due_today)} question{'s' if len(due_today) != 1 else ''}")
 
-    # Reviewed today
-    reviewed_today_resp = supabase.table("reviews").select("id", count="exact") \
-        .eq("review_date", today.isoformat()).execute()
-    reviewed_today = reviewed_today_resp.count if reviewed_today_resp.count else 0
+    histories = get_review_histories(tuple(row["id"] for row in due_today))
+    review_panel(due_today, histories)
 
-    # Total reviewed (distinct questions)
-    response = supabase.table("reviews") \
-        .select("question_id", count="exact") \
-        .execute()
-
-    # Count distinct question_id
-    reviewed_total = len({row["question_id"] for row in response.data})
+# --- Tab 2: Dashboard ---
+with tab2:
+    metrics = get_dashboard_metrics(TODAY)
 
     col1, col2, col3, col4 = st.columns(4)
-    col1.metric("Total Questions", total)
-    col2.metric("Due Today", due_today)
-    col3.metric("Reviewed Today", reviewed_today)
-    col4.metric("Total Reviewed", reviewed_total)
+    col1.metric("Total Questions", metrics["total"])
+    col2.metric("Due Today", metrics["due_today"])
+    col3.metric("Reviewed Today", metrics["reviewed_today"])
+    col4.metric("Total Reviewed", metrics["reviewed_total"])
+
+    # --- Default range ---
+    start_date = datetime(2025, 7, 30)
+    end_date = start_date + timedelta(days=30)
 
-    df_full = get_reviews_per_day()
+    df_full = get_reviews_per_day(start_date.date(), end_date.date())
     if not df_full.empty:
-        # --- Default range ---
-        start_date = datetime(2025, 7, 30)
-        end_date = start_date + timedelta(days=30)
         all_dates = pd.date_range(start=start_date, end=end_date)
 
-        counts = dict(zip(df_full['date'], df_full['count']))
-
-        weeks = [(d - start_date).days // 7 for d in all_dates]
-        # Map weekday to Sun=0 ... Sat=6
-        weekdays = [(d.weekday() + 1) % 7 for d in all_dates]
-        values = [counts.get(d, None) for d in all_dates]  # None for no data = transparent
-
-        fig = go.Figure(data=go.Heatmap(
-            x=weeks,
-            y=weekdays,
-            z=values,
-            text=[f"{d.date()}: {counts.get(d, 0)} reviews" for d in all_dates],
-            hoverinfo="text",
-            colorscale=[
-                [0, "#ebedf0"],
-                [0.2, "#c6e48b"],
-                [0.4, "#7bc96f"],
-                [0.6, "#239a3b"],
-                [1.0, "#196127"]
-            ],
-            zmin=0,
-            zmax=max(counts.values()) if counts else 1,
-            showscale=False,
-            hoverongaps=False
-        ))
-
-        fig.update_layout(
-            title="📅 Review Activity",
-            xaxis=dict(showgrid=False, zeroline=False, showticklabels=False, fixedrange=True),
-            yaxis=dict(
-                showgrid=False,
-                zeroline=False,
-                tickmode="array",
-                tickvals=[0, 1, 2, 3, 4, 5, 6],
-                ticktext=["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"],
-                fixedrange=True,
-                autorange='reversed'  # Flip vertical order
-            ),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            dragmode=False,
-            height=180,
-            margin=dict(l=20, r=20, t=30, b=20)
-        )
+        # Vectorized instead of per-date Python loops
+        counts = df_full.set_index('date')['count'].reindex(all_dates, fill_value=0)
 
+        fig = build_heatmap(tuple(int(c) for c in counts), start_date)
         st.plotly_chart(fig, use_container_width=True)
 
-        selected_date = st.date_input("📌 Select a date to see reviewed questions", today)
+        selected_date = st.date_input("📌 Select a date to see reviewed questions", TODAY)
         reviewed_questions = get_questions_reviewed_on(selected_date)
         if reviewed_questions:
             st.success(f"Reviewed on {selected_date}:")
@@ -309,12 +342,10 @@ with tab2:
 with tab3:
     # Reset all button
     if st.button("🔄 Reset All Review Dates"):
-        today = datetime.today().date()
-        supabase.table("questions").update({
-            "last_reviewed": None,
-            "next_review": today.isoformat(),
-            "interval_days": 3
-        }).neq("id", 0).execute()  # `neq` used to target all rows
+        # One RPC; the updated rows are not sent back over the wire
+        supabase.rpc("reset_all_questions").execute()
+        get_all_questions.clear()
+        get_grouped_questions.clear()
         if "reviewing" in st.session_state:
             del st.session_state["reviewing"]
         st.success("All questions have been reset!")
@@ -325,66 +356,89 @@ with tab3:
         st.success(st.session_state["success_msg"])
         del st.session_state["success_msg"]
 
-    all_qs = get_all_questions()
-    if not all_qs:
+    total_questions = get_question_count()
+    if not total_questions:
         st.info("No questions added yet!")
     else:
-        for row in all_qs:
-            with st.expander(f"{row['question']} (Next Review: {row['next_review']})"):
-                col1, col2, col3 = st.columns([2, 2, 2])
-                
-                # --- Add to today's review ---
-                with col1:
-                    if st.button("Add to today's review", key=f"all_{row['id']}"):
-                        today = datetime.today().date()
-                        supabase.table("questions").update({
-                            "next_review": today.isoformat()
-                        }).eq("id", row['id']).execute()
-                        st.session_state["success_msg"] = (
-                            f"Added '{row['question']}' to today's review.\n\n"
-                            "Check \"Review\" tab to start reviewing the added question"
-                        )
-                        st.rerun()
+        page_count = (total_questions + PAGE_SIZE - 1) // PAGE_SIZE
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1)
+        all_qs = get_all_questions(page)
+
+        # One table widget instead of an expander + three buttons per row
+        df = pd.DataFrame(all_qs)[["question", "next_review"]]
+        df.columns = ["Question", "Next Review"]
+        event = st.dataframe(
+            df,
+            on_select="rerun",
+            selection_mode="single-row",
+            hide_index=True,
+            use_container_width=True
+        )
 
-                if "success_msg" in st.session_state:
-                    st.success(st.session_state["success_msg"])
-
-                # --- Edit question ---
-                with col2:
-                    if st.button("✏️ Edit question", key=f"edit_{row['id']}"):
-                        if ("edit_question_id" not in st.session_state or 
-                            st.session_state["edit_question_id"] != row['id']):
-                            st.session_state["edit_question_id"] = row['id']
-                            st.session_state["edit_question_text"] = row['question']
-                            st.session_state["edit_answer_text"] = row['answer']
-                        st.rerun()
+        # Action panel for the selected row
+        if event.selection.rows:
+            row = all_qs[event.selection.rows[0]]
+            st.markdown(f"**Selected:** {row['question']} (Next Review: {row['next_review']})")
+            col1, col2, col3 = st.columns([2, 2, 2])
+
+            # --- Add to today's review ---
+            with col1:
+                if st.button("Add to today's review", key="add_today"):
+                    supabase.table("questions").update({
+                        "next_review": TODAY.isoformat()
+                    }, returning="minimal").eq("id", row['id']).execute()
+                    get_all_questions.clear()
+                    get_grouped_questions.clear()
+                    st.session_state["success_msg"] = (
+                        f"Added '{row['question']}' to today's review.\n\n"
+                        "Check \"Review\" tab to start reviewing the added question"
+                    )
+                    st.rerun()
 
-                # --- Remove question ---
-                with col3:
-                    if st.button("🗑️ Remove question", key=f"remove_{row['id']}"):
-                        supabase.table("questions").delete().eq("id", row['id']).execute()
-                        supabase.table("reviews").delete().eq("question_id", row['id']).execute()
-                        st.success("Question removed.")
-                        st.rerun()
+            # --- Edit question ---
+            with col2:
+                if st.button("✏️ Edit question", key="edit_selected"):
+                    if ("edit_question_id" not in st.session_state or
+                        st.session_state["edit_question_id"] != row['id']):
+                        detail = get_question_detail(row['id'])
+                        st.session_state["edit_question_id"] = row['id']
+                        st.session_state["edit_question_text"] = detail['question']
+                        st.session_state["edit_answer_text"] = detail['answer']
+                    st.rerun()
+
+            # --- Remove question ---
+            with col3:
+                if st.button("🗑️ Remove question", key="remove_selected"):
+                    supabase.table("questions").delete(returning="minimal").eq("id", row['id']).execute()
+                    supabase.table("reviews").delete(returning="minimal").eq("question_id", row['id']).execute()
+                    get_all_questions.clear()
+                    get_question_count.clear()
+                    get_grouped_questions.clear()
+                    get_question_detail.clear()
+                    st.success("Question removed.")
+                    st.rerun()
 
-                # --- Edit form ---
-                if st.session_state.get("edit_question_id") == row['id']:
-                    with st.form(key=f"edit_form_{row['id']}"):
-                        new_q = st.text_area("Edit Question", value=st.session_state.get("edit_question_text", row['question']))
-                        new_a = st.text_area("Edit Answer", value=st.session_state.get("edit_answer_text", row['answer']))
-                        submitted = st.form_submit_button("Save Changes")
-                        cancel = st.form_submit_button("Cancel")
-                        if submitted:
-                            supabase.table("questions").update({
-                                "question": new_q,
-                                "answer": new_a
-                            }).eq("id", row['id']).execute()
-                            st.success("Question updated.")
-                            del st.session_state["edit_question_id"]
-                            st.rerun()
-                        elif cancel:
-                            del st.session_state["edit_question_id"]
-                            st.rerun()
+            # --- Edit form ---
+            if st.session_state.get("edit_question_id") == row['id']:
+                with st.form(key=f"edit_form_{row['id']}"):
+                    new_q = st.text_area("Edit Question", value=st.session_state.get("edit_question_text", row['question']))
+                    new_a = st.text_area("Edit Answer", value=st.session_state.get("edit_answer_text", ""))
+                    submitted = st.form_submit_button("Save Changes")
+                    cancel = st.form_submit_button("Cancel")
+                    if submitted:
+                        supabase.table("questions").update({
+                            "question": new_q,
+                            "answer": new_a
+                        }, returning="minimal").eq("id", row['id']).execute()
+                        get_all_questions.clear()
+                        get_grouped_questions.clear()
+                        get_question_detail.clear()
+                        st.success("Question updated.")
+                        del st.session_state["edit_question_id"]
+                        st.rerun()
+                    elif cancel:
+                        del st.session_state["edit_question_id"]
+                        st.rerun()
 
 # --- Tab 4: Add Question ---
 with tab4:
@@ -0,0 +1,51 @@
+-- Run this in the Supabase SQL editor (after creating the questions/reviews tables).
+
+-- Indexes for the date filters used on every read path
+-- (verify with: explain analyze select * from questions where next_review <= current_date;)
+create index if not exists questions_next_review_idx on questions(next_review);
+create index if not exists reviews_review_date_idx on reviews(review_date);
+create index if not exists reviews_qid_date_idx on reviews(question_id, review_date);
+
+-- All four dashboard counts in one round trip
+create or replace function dashboard_metrics() returns json as $$
+    select json_build_object(
+        'total', (select count(*) from questions),
+        'due_today', (select count(*) from questions where next_review = current_date),
+        'reviewed_today', (select count(*) from reviews where review_date = current_date),
+        'reviewed_total', (select count(distinct question_id) from reviews)
+    )
+$$ language sql stable;
+
+-- Reschedule a question and log the review in one atomic call
+create or replace function mark_reviewed(qid int, remembered bool) returns void as $$
+    update questions
+    set interval_days = case when remembered then least(interval_days * 2, 60) else 3 end,
+        last_reviewed = current_date,
+        next_review = current_date + case when remembered then least(interval_days * 2, 60) else 3 end
+    where id = qid;
+    insert into reviews(question_id, review_date) values (qid, current_date);
+$$ language sql;
+
+-- Reset every question's schedule without shipping the updated rows back
+-- (review history is left intact, same as the old reset button)
+create or replace function reset_all_questions() returns void as $$
+    update questions
+    set last_reviewed = null,
+        next_review = current_date,
+        interval_days = 3
+$$ language sql;
+
+-- Reviews joined to their question text, deduped per date in Postgres
+create or replace view reviews_with_question as
+    select distinct r.review_date, q.id as qid, q.question
+    from reviews r
+    join questions q on q.id = r.question_id;
+
+-- Daily review counts for the heatmap, aggregated in Postgres
+create or replace function reviews_per_day(start_date date, end_date date)
+returns table(review_date date, count bigint) as $$
+    select review_date, count(*)
+    from reviews
+    where review_date between start_date and end_date
+    group by review_date
+$$ language sql stable;
@@ -16,6 +16,6 @@ print("Key starts with:", key[:10] if key else None)
 # Create client
 client = create_client(url, key)
 
-# Test query
-response = client.table("questions").select("*").execute()
-print(response)
+# Test query (head-only count: verifies connectivity without downloading rows)
+response = client.table("questions").select("id", count="exact", head=True).execute()
+print("Questions in table:", response.count)